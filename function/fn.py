@@ -15,16 +15,34 @@
 
 """A Crossplane composition function."""
 
+import functools
 import hashlib
-import json
+from collections.abc import Iterator
+from logging import DEBUG
 
 import grpc
+import orjson
 from crossplane.function import logging, request, resource, response
 from crossplane.function.proto.v1 import run_function_pb2 as fnv1
 from crossplane.function.proto.v1 import run_function_pb2_grpc as grpcv1
-from jsonrpcclient import request_json
-
-JSONRPC_BASE = {"version": 1, "format": "json"}
+from google.protobuf import struct_pb2 as structpb
+from jsonrpcclient import id_generators
+
+# Compact runCmds JSON-RPC envelope, serialized once; only the cmds list and
+# the id are encoded per request.
+RUNCMDS_PREFIX = (
+    '{"jsonrpc":"2.0","method":"runCmds","params":{"version":1,"format":"json","cmds":'
+)
+RUNCMDS_IDS = id_generators.decimal()
+
+JQ_EXPECTED = (
+    ".response.body.error == null and "
+    "(.response.body.result[1]{tree}.cmds | has({key}))"
+)
+JQ_REMOVED = (
+    ".response.body.error == null and "
+    "(.response.body.result[1]{tree}.cmds | has({key}) | not)"
+)
 
 
 class FunctionRunner(grpcv1.FunctionRunnerService):
@@ -66,63 +84,69 @@ class FunctionRunner(grpcv1.FunctionRunnerService):
             "basePath": "/command-api",
         }
 
-        jsonrpc_observe_params = {
-            **JSONRPC_BASE,
-            "cmds": ["enable", "show running-config"],
-        }
-        jsonrpc_observe = request_json("runCmds", params=jsonrpc_observe_params)
+        jsonrpc_observe = runcmds_json(["enable", "show running-config"])
 
-        command_paths = sorted(walk_cmds(cmds))
-        log.info("Generated command paths", count=len(command_paths))
+        request_template = construct_request_template(jsonrpc_cfg, jsonrpc_observe)
 
-        for path in command_paths:
+        debug_enabled = log.is_enabled_for(DEBUG)
+        desired_resources = rsp.desired.resources
+        count = 0
+
+        for path, tree in walk_cmds(cmds):
+            count += 1
             name = name_based_on_path(observed_xr_name, path)
 
-            path_log = log.bind(resource=name, path=" | ".join(path))
-            path_log.debug("Creating resource")
+            if debug_enabled:
+                path_log = log.bind(resource=name, path=" | ".join(path))
+                path_log.debug("Creating resource")
 
-            jsonrpc_create_params = {
-                **JSONRPC_BASE,
-                "cmds": ["enable", "configure", *path],
-            }
-            jsonrpc_create = request_json("runCmds", params=jsonrpc_create_params)
-
-            jsonrpc_remove_params = {
-                **JSONRPC_BASE,
-                "cmds": [
+            jsonrpc_create = runcmds_json(["enable", "configure", *path])
+            jsonrpc_remove = runcmds_json(
+                [
                     "enable",
                     "configure",
                     *build_remove_path(path, remove_container=remove_container),
-                ],
-            }
-            jsonrpc_remove = request_json("runCmds", params=jsonrpc_remove_params)
+                ]
+            )
 
-            expected_logic, removed_logic = create_jq_logic_expressions(path)
+            expected_logic, removed_logic = create_jq_logic_expressions(path, tree)
 
             jsonrpc_ops = {
                 "create": jsonrpc_create,
-                "observe": jsonrpc_observe,
                 "remove": jsonrpc_remove,
                 "expectedResponseCheck": expected_logic,
                 "isRemovedCheck": removed_logic,
             }
 
-            resource_data = construct_request_resource(name, jsonrpc_ops, jsonrpc_cfg)
+            desired = desired_resources[name].resource
+            desired.CopyFrom(request_template)
+            fill_request(desired, name, jsonrpc_ops)
 
-            resource.update(
-                rsp.desired.resources[name],
-                resource_data,
-            )
+        log.info("Generated command paths", count=count)
 
         return rsp
 
 
-def name_based_on_path(observed_xr_name: str, path: list[str]) -> str:
-    """name_based_on_path function."""
-    prefix = f"{observed_xr_name[:15]}".rstrip("-")
-    _joint = "".join(path)
-    suffix = hashlib.sha256(_joint.encode("utf-8"), usedforsecurity=False).hexdigest()
-    return f"{prefix}-{suffix}".strip()[:63]
+def runcmds_json(cmds: list[str]) -> str:
+    """Serialize an eAPI runCmds JSON-RPC request for the given cmds."""
+    return f'{RUNCMDS_PREFIX}{orjson.dumps(cmds).decode()}}},"id":{next(RUNCMDS_IDS)}}}'
+
+
+# Shared by all XRs and scanned in the same order on every reconcile, so the
+# bound must hold every path the function serves or each lookup evicts the
+# entry the next scan needs. 65536 names is about 20 MB at most.
+@functools.lru_cache(maxsize=65536)
+def name_based_on_path(observed_xr_name: str, path: tuple[str, ...]) -> str:
+    """name_based_on_path function.
+
+    The suffix must stay SHA-256 of the joined path: it names the composed
+    resources, so changing the digest would replace every existing Request.
+    """
+    prefix = observed_xr_name[:15].rstrip("-")
+    digest = hashlib.sha256(usedforsecurity=False)
+    for cmd in path:
+        digest.update(cmd.encode("utf-8"))
+    return f"{prefix}-{digest.hexdigest()}".strip()[:63]
 
 
 def toggle_no(cmd: str) -> str:
@@ -130,7 +154,9 @@ def toggle_no(cmd: str) -> str:
     return cmd.removeprefix("no ") if cmd.startswith("no ") else f"no {cmd}"
 
 
-def build_remove_path(path: list[str], *, remove_container: bool = False) -> list[str]:
+def build_remove_path(
+    path: tuple[str, ...], *, remove_container: bool = False
+) -> list[str]:
     """Create cmd for remove op."""
     head, *tail = path
 
@@ -149,42 +175,45 @@ def build_remove_path(path: list[str], *, remove_container: bool = False) -> lis
     return [toggle_no(head)]
 
 
-def jq_path(cmds: list[str]) -> str:
-    """Create middle part of jq logic expression."""
-    return "".join([f".cmds[{json.dumps(c)}]" for c in cmds])
-
+def create_jq_logic_expressions(path: tuple[str, ...], tree: str) -> tuple[str, str]:
+    """Compose jq logic expressions.
 
-def create_jq_logic_expressions(path: list[str]) -> tuple[str, str]:
-    """Compose jq logic expressions."""
-    base = ".response.body"
-    tree = f"{base}.result[1]{jq_path(path[:-1])}.cmds"
-    check = f"has({json.dumps(path[-1])})"
+    tree is the jq path of the parent command, as emitted by walk_cmds().
+    """
+    key = orjson.dumps(path[-1]).decode()
 
-    expected = f"{base}.error == null and ({tree} | {check})"
-    removed = f"{base}.error == null and ({tree} | {check} | not)"
+    expected = JQ_EXPECTED.format(tree=tree, key=key)
+    removed = JQ_REMOVED.format(tree=tree, key=key)
 
     return expected, removed
 
 
-def walk_cmds(cmds: dict, path: list[str] | None = None) -> list[list[str]]:
-    """Make command paths from nested command tree."""
-    if path is None:
-        path = []
+def walk_cmds(cmds: dict) -> Iterator[tuple[tuple[str, ...], str]]:
+    """Yield command paths from nested command tree.
+
+    Each leaf is emitted with the jq path of its parent, e.g.
+    '.cmds["router bgp 1"].cmds["address-family ipv4"]', built once per
+    parent while descending.
 
-    results: list[list[str]] = []
+    Siblings are pushed onto the stack in reverse, so paths are popped
+    and emitted in sorted order.
+    """
+    stack: list[tuple[dict, tuple[str, ...], str]] = [
+        (cmds[cmd], (cmd,), "") for cmd in sorted(cmds, reverse=True)
+    ]
 
-    for cmd in sorted(cmds.keys()):
-        subtree = cmds[cmd]
-        next_path = [*path, cmd]
+    while stack:
+        subtree, path, parent_tree = stack.pop()
 
-        if subtree == {}:
-            # Leaf -> emit array
-            results.append(next_path)
-        else:
-            # Recurse
-            results.extend(walk_cmds(subtree, next_path))
+        if not subtree:
+            # Leaf -> emit path
+            yield path, parent_tree
+            continue
 
-    return results
+        tree = f"{parent_tree}.cmds[{orjson.dumps(path[-1]).decode()}]"
+        stack.extend(
+            (subtree[cmd], (*path, cmd), tree) for cmd in sorted(subtree, reverse=True)
+        )
 
 
 def get_envs(environment: dict) -> tuple[int, str, bool]:
@@ -201,59 +230,87 @@ def get_envs(environment: dict) -> tuple[int, str, bool]:
     return port, scheme, insecure_skip_tls_verify
 
 
-def construct_request_resource(name: str, ops: dict, config: dict) -> dict:
-    """Construct the resource request for the given data."""
-    return {
-        "apiVersion": "http.crossplane.io/v1alpha2",
-        "kind": "Request",
-        "metadata": {
-            "name": name,
-        },
-        "spec": {
-            "forProvider": {
-                "insecureSkipTLSVerify": config["insecureSkipTLSVerify"],
-                "headers": {
-                    "Accept": ["application/json"],
-                    "Authorization": [f"Basic {config['basicAuth']}"],
-                },
-                "payload": {
-                    "baseUrl": f"{config['scheme']}://{config['fqdn']}:{config['port']}{config['basePath']}",
-                    "body": ops["create"],
-                },
-                "mappings": [
-                    {
-                        "action": "CREATE",
-                        "method": "POST",
-                        "url": ".payload.baseUrl",
-                        "body": ".payload.body",
+def construct_request_template(config: dict, observe: str) -> structpb.Struct:
+    """Construct the Request shared by all command paths.
+
+    Per-path fields are left empty and set by fill_request().
+    """
+    return resource.dict_to_struct(
+        {
+            "apiVersion": "http.crossplane.io/v1alpha2",
+            "kind": "Request",
+            "metadata": {
+                "name": "",
+            },
+            "spec": {
+                "forProvider": {
+                    "insecureSkipTLSVerify": config["insecureSkipTLSVerify"],
+                    "headers": {
+                        "Accept": ["application/json"],
+                        "Authorization": [f"Basic {config['basicAuth']}"],
                     },
-                    {
-                        "action": "UPDATE",
-                        "method": "POST",
-                        "url": ".payload.baseUrl",
-                        "body": ".payload.body",
+                    "payload": {
+                        "baseUrl": f"{config['scheme']}://{config['fqdn']}:{config['port']}{config['basePath']}",
+                        "body": "",
                     },
-                    {
-                        "action": "OBSERVE",
-                        "method": "POST",
-                        "url": ".payload.baseUrl",
-                        "body": ops["observe"],
+                    "mappings": [
+                        {
+                            "action": "CREATE",
+                            "method": "POST",
+                            "url": ".payload.baseUrl",
+                            "body": ".payload.body",
+                        },
+                        {
+                            "action": "UPDATE",
+                            "method": "POST",
+                            "url": ".payload.baseUrl",
+                            "body": ".payload.body",
+                        },
+                        {
+                            "action": "OBSERVE",
+                            "method": "POST",
+                            "url": ".payload.baseUrl",
+                            "body": observe,
+                        },
+                        {
+                            "action": "REMOVE",
+                            "method": "POST",
+                            "url": ".payload.baseUrl",
+                            "body": "",
+                        },
+                    ],
+                    "expectedResponseCheck": {
+                        "type": "CUSTOM",
+                        "logic": "",
                     },
-                    {
-                        "action": "REMOVE",
-                        "method": "POST",
-                        "url": ".payload.baseUrl",
-                        "body": ops["remove"],
+                    "isRemovedCheck": {
+                        "type": "CUSTOM",
+                        "logic": "",
                     },
-                ],
-                "expectedResponseCheck": {
-                    "type": "CUSTOM",
-                    "logic": ops["expectedResponseCheck"],
-                },
-                "isRemovedCheck": {
-                    "type": "CUSTOM",
-                    "logic": ops["isRemovedCheck"],
                 },
             },
-        },
-    }
+        }
+    )
+
+
+def fill_request(request_resource: structpb.Struct, name: str, ops: dict) -> None:
+    """Set the per-path fields of a Request copied from the template.
+
+    Fields are written through Struct.fields directly, skipping the
+    per-level Python wrappers of Struct item access.
+    """
+    fields = request_resource.fields
+    fields["metadata"].struct_value.fields["name"].string_value = name
+
+    for_provider = fields["spec"].struct_value.fields["forProvider"].struct_value.fields
+    payload = for_provider["payload"].struct_value.fields
+    payload["body"].string_value = ops["create"]
+
+    # REMOVE is the last mapping
+    remove = for_provider["mappings"].list_value.values[-1].struct_value.fields
+    remove["body"].string_value = ops["remove"]
+
+    expected = for_provider["expectedResponseCheck"].struct_value.fields
+    expected["logic"].string_value = ops["expectedResponseCheck"]
+    removed = for_provider["isRemovedCheck"].struct_value.fields
+    removed["logic"].string_value = ops["isRemovedCheck"]
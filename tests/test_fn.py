@@ -14,6 +14,7 @@
 
 
 import json
+import sys
 import unittest
 
 from crossplane.function import logging, resource
@@ -169,3 +170,158 @@ class TestFunctionRunner(unittest.IsolatedAsyncioTestCase):
             actions,
             {"CREATE", "UPDATE", "OBSERVE", "REMOVE"},
         )
+
+    async def test_run_function_reuses_names_on_reconcile(self) -> None:
+        """Reconciling the same large CliConfig again hits the name cache."""
+        # More paths than a small LRU bound, scanned in the same order each time.
+        cmds = {
+            f"interface Ethernet{i}": {f"description d{j}": {} for j in range(30)}
+            for i in range(100)
+        }
+        composite = {
+            "apiVersion": "netclab.dev/v1alpha1",
+            "kind": "CliConfig",
+            "metadata": {"name": "eoscommand-1"},
+            "spec": {"endpoint": "ceos01.default.svc.cluster.local", "cmds": cmds},
+        }
+        environment = {"jsonrpc": {"scheme": "http", "port": 6021}}
+
+        req = fnv1.RunFunctionRequest(
+            observed=fnv1.State(
+                composite=fnv1.Resource(resource=resource.dict_to_struct(composite))
+            ),
+            context=structpb.Struct(
+                fields={
+                    "apiextensions.crossplane.io/environment": structpb.Value(
+                        struct_value=resource.dict_to_struct(environment)
+                    )
+                }
+            ),
+        )
+
+        runner = fn.FunctionRunner()
+        fn.name_based_on_path.cache_clear()
+
+        await runner.RunFunction(req, None)
+        resp = await runner.RunFunction(req, None)
+
+        info = fn.name_based_on_path.cache_info()
+        self.assertEqual(len(resp.desired.resources), 3000)
+        self.assertEqual(info.misses, 3000)
+        self.assertEqual(info.hits, 3000)
+
+
+class TestWalkCmds(unittest.TestCase):
+    def test_walk_cmds_emits_sorted_leaf_paths(self) -> None:
+        cmds = {
+            "router bgp 65001": {
+                "neighbor 10.0.0.2 remote-as 65002": {},
+                "address-family ipv4": {"network 10.0.0.1/32": {}},
+            },
+            "hostname ceos01": {},
+        }
+
+        self.assertEqual(
+            list(fn.walk_cmds(cmds)),
+            [
+                (("hostname ceos01",), ""),
+                (
+                    (
+                        "router bgp 65001",
+                        "address-family ipv4",
+                        "network 10.0.0.1/32",
+                    ),
+                    '.cmds["router bgp 65001"].cmds["address-family ipv4"]',
+                ),
+                (
+                    ("router bgp 65001", "neighbor 10.0.0.2 remote-as 65002"),
+                    '.cmds["router bgp 65001"]',
+                ),
+            ],
+        )
+
+    def test_walk_cmds_handles_trees_deeper_than_recursion_limit(self) -> None:
+        depth = sys.getrecursionlimit() + 100
+        cmds: dict = {}
+        subtree = cmds
+        for i in range(depth):
+            subtree[f"cmd {i}"] = {}
+            subtree = subtree[f"cmd {i}"]
+
+        paths = list(fn.walk_cmds(cmds))
+
+        self.assertEqual(len(paths), 1)
+        path, _ = paths[0]
+        self.assertEqual(len(path), depth)
+
+    def test_walk_cmds_ignores_insertion_order(self) -> None:
+        cmds = {
+            "interface Ethernet2": {"no shutdown": {}, "description uplink": {}},
+            "interface Ethernet1": {"shutdown": {}},
+        }
+        reordered = {
+            "interface Ethernet1": {"shutdown": {}},
+            "interface Ethernet2": {"description uplink": {}, "no shutdown": {}},
+        }
+
+        paths = list(fn.walk_cmds(cmds))
+
+        self.assertEqual(paths, list(fn.walk_cmds(reordered)))
+        self.assertEqual(paths, sorted(paths), "paths are not sorted")
+
+
+class TestNameBasedOnPath(unittest.TestCase):
+    def test_name_is_stable_across_releases(self) -> None:
+        # Names identify composed resources; changing them recreates Requests.
+        self.assertEqual(
+            fn.name_based_on_path(
+                "eoscommand-1",
+                ("ip prefix-list PL-Loopback0", "seq 10 permit 10.0.0.1/32 eq 32"),
+            ),
+            "eoscommand-1-1a2c114ed6c93d688a2f215bef12df003efac252912d4ed6ba",
+        )
+
+    def test_name_fits_kubernetes_limit(self) -> None:
+        name = fn.name_based_on_path("a-very-long-composite-resource-name", ("cmd",))
+
+        self.assertEqual(len(name), 63)
+        self.assertTrue(name.startswith("a-very-long-com-"))
+
+
+class TestRuncmdsJson(unittest.TestCase):
+    def test_runcmds_json_is_a_valid_jsonrpc_request(self) -> None:
+        body = json.loads(fn.runcmds_json(["enable", 'description "uplink"']))
+
+        self.assertEqual(body["jsonrpc"], "2.0")
+        self.assertEqual(body["method"], "runCmds")
+        self.assertEqual(
+            body["params"],
+            {
+                "version": 1,
+                "format": "json",
+                "cmds": ["enable", 'description "uplink"'],
+            },
+        )
+        self.assertIsInstance(body["id"], int)
+
+
+class TestCreateJqLogicExpressions(unittest.TestCase):
+    def test_expressions_check_leaf_under_parent_path(self) -> None:
+        [(path, parent_tree)] = fn.walk_cmds(
+            {"router bgp 65001": {"address-family ipv4": {"network 10.0.0.1/32": {}}}}
+        )
+        expected, removed = fn.create_jq_logic_expressions(path, parent_tree)
+
+        tree = (
+            '.response.body.result[1].cmds["router bgp 65001"]'
+            '.cmds["address-family ipv4"].cmds'
+        )
+        self.assertEqual(
+            expected,
+            f'.response.body.error == null and ({tree} | has("network 10.0.0.1/32"))',
+        )
+        self.assertEqual(
+            removed,
+            ".response.body.error == null and "
+            f'({tree} | has("network 10.0.0.1/32") | not)',
+        )